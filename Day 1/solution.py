@@ -1,6 +1,7 @@
 """Solution to Advent of Code 2018, Day 1: Chronal Calibration (https://adventofcode.com/2018/day/1)."""
 import itertools
 import pathlib
+from collections import defaultdict
 
 
 def part_one(nums):
@@ -14,27 +15,110 @@ def part_one(nums):
     return sum(nums)
 
 
-def part_two(nums):
+class SeenFrequencies():
     '''
-    Question:
-        What is the first frequency your device reaches twice?
-
-    Changes frequency and adds it to the set,
-    until there is no change in length of it.
+    Set of integer frequencies from a known range, stored as a bitmap with
+    one bit per frequency. Falls back to a regular set if the range is too
+    wide for a bitmap (more than max_bits frequencies), or too sparse for it
+    (more than 64 bits per frequency that will be stored, i.e. a bitmap would
+    take more memory than a set).
     '''
 
-    frequencies = set()
-    current_frequency = 0
+    def __init__(self, lowest, highest, count, max_bits=2 ** 30):
+
+        self.offset = lowest
+        size = highest - lowest + 1
 
-    for n in itertools.cycle(nums):
-        current_frequency += n
+        if size <= max_bits and size <= 64 * count:
+            self.bits = bytearray((size + 7) // 8)
+            self.fallback = None
+        else:
+            self.bits = None
+            self.fallback = set()
 
-        old_len = len(frequencies)
-        frequencies.add(current_frequency)
-        new_len = len(frequencies)
+    def add(self, frequency):
+        '''Adds frequency, returns True if it wasn't already in the set.'''
+        if self.fallback is not None:
+            if frequency in self.fallback:
+                return False
+            self.fallback.add(frequency)
+            return True
 
-        if old_len == new_len:
-            return current_frequency
+        index, bit = divmod(frequency - self.offset, 8)
+        mask = 1 << bit
+        if self.bits[index] & mask:
+            return False
+        self.bits[index] |= mask
+        return True
+
+
+def first_repeated_frequency(nums):
+    '''
+    Finds the first frequency reached twice without replaying the changes
+    over and over, returns None if no frequency is ever reached twice.
+
+    After k full passes the frequency reached at step i is prefix[i] + k * drift,
+    where prefix are the frequencies of the first pass (starting with 0) and
+    drift is the sum of all changes. So frequency prefix[j] can be reached
+    again only from prefix[i] that has the same remainder modulo drift,
+    after (prefix[j] - prefix[i]) / drift passes. Prefix sums are grouped by
+    remainder and sorted, so for each of them the nearest one in the
+    direction of the drift is the first one it reaches.
+
+    Example:
+        print(first_repeated_frequency([+3, +3, +4, -2, -4]))
+        10
+        print(first_repeated_frequency([+1, +1]))
+        None
+    '''
+    if not nums:
+        return None
+
+    # Frequencies of the first pass and the one it ends with,
+    # e.g. [+1, -2, +3] -> [0, 1, -1, 2]
+    prefix = list(itertools.accumulate(nums, initial=0))
+    drift = prefix.pop()
+
+    # The first pass only visits frequencies between its extremes, so the
+    # seen frequencies fit in a bitmap of known size
+    seen = SeenFrequencies(min(prefix), max(prefix), len(prefix))
+    for frequency in prefix:
+        if not seen.add(frequency):
+            return frequency
+
+    if drift == 0:
+        # After one pass device is back at the starting frequency
+        return 0
+
+    # Groups step indexes of the first pass by remainder modulo drift
+    groups = defaultdict(list)
+    for index, frequency in enumerate(prefix):
+        groups[frequency % drift].append(index)
+
+    # Tuple with the step at which the repetition happens and the frequency
+    first_repeat = None
+    for indexes in groups.values():
+        indexes.sort(key=lambda index: prefix[index], reverse=drift < 0)
+        for i, j in zip(indexes, indexes[1:]):
+            passes = (prefix[j] - prefix[i]) // drift
+            step = passes * len(nums) + i
+            if first_repeat is None or step < first_repeat[0]:
+                first_repeat = (step, prefix[j])
+
+    if first_repeat is None:
+        return None
+    return first_repeat[1]
+
+
+def part_two(nums):
+    '''
+    Question:
+        What is the first frequency your device reaches twice?
+
+    Finds the first repeated frequency analytically from the frequencies of
+    a single pass over the changes.
+    '''
+    return first_repeated_frequency(nums)
 
 
 def main():
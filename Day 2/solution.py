@@ -1,77 +1,211 @@
 """Solution to Advent of Code 2018, Day 2: Inventory Management System (https://adventofcode.com/2018/day/2)."""
-import collections
-import itertools
 import pathlib
+from collections import defaultdict
+from string import ascii_lowercase
 
+# Byte values of lowercase letters
+LETTERS = ascii_lowercase.encode()
 
-def part_one(list_of_ids):
+
+def checksum(data):
     '''
-    Question:
-        What is the checksum for your list of box IDs?
+    Produces a checksum from raw bytes with one box ID per line.
 
-    Produces a checksum by multiplying how many of IDs contains a letter which appears twice and three times.
+    Counts each of 26 letters within the line of the ID with bytes.count(),
+    so no objects are created per ID.
+
+    Example:
+        data = b'abcdef\nbababc\nabbcde\nabcccd\naabcdd\nabcdee\nababab\n'
+        print(checksum(data))
+        12
     '''
 
-    ntimes = {2: 0, 3: 0}
-    for id_ in list_of_ids:
-        letter_ntimes = {}
-        collections._count_elements(letter_ntimes, id_)
-        ntimes_set = set(list(letter_ntimes.values()))
-        ntimes_set.discard(1)
-        collections._count_elements(ntimes, ntimes_set)
-    checksum = ntimes[2] * ntimes[3]
-    return checksum
+    twos = 0
+    threes = 0
+
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start)
+        if end == -1:
+            end = len(data)
+
+        has_two = False
+        has_three = False
+        for letter in LETTERS:
+            count = data.count(letter, start, end)
+            if count == 2:
+                has_two = True
+            elif count == 3:
+                has_three = True
+
+        twos += has_two
+        threes += has_three
+        start = end + 1
 
+    return twos * threes
 
-def part_two(list_of_ids):
+
+def part_one(data):
     '''
     Question:
-            What letters are common between the two correct box IDs?
+        What is the checksum for your list of box IDs?
 
-    Finds common letters by removing the different character from either ID,
-    that differ by exactly one character(e.g., 'fghij' and 'fguij').
+    Produces a checksum by multiplying how many of IDs contains a letter which appears twice and three times.
+    Takes raw bytes of the list with one ID per line.
     '''
+    return checksum(data)
 
-    def differ_by_one_letter(s1, s2):
-        '''Compares two strings, returns True if they differ by 1 letter.'''
-        already_diffrent = False
 
-        for c1, c2 in zip(s1, s2):
-            if c1 != c2:
-                if already_diffrent:
-                    return False
-                else:
-                    already_diffrent = True
+def near_duplicates(list_of_ids):
+    '''
+    Generator that yields all pairs of IDs that differ by exactly one
+    character, with their common letters.
+
+    For each position every ID is hashed with the character at that
+    position removed, so two IDs that differ only at that position get the
+    same key, e.g. 'fghij' and 'fguij' both give 'fgij' at position 2. Only
+    the buckets of one position are kept at a time.
+
+    Example:
+        ids = ['abcde', 'fghij', 'klmno', 'pqrst', 'fguij', 'axcye', 'wvxyz']
+        for pair in near_duplicates(ids):
+            print(pair)
+        ('fghij', 'fguij', 'fgij')
+    '''
 
-        return True
+    list_of_ids = list(list_of_ids)
+    max_length = max((len(id_) for id_ in list_of_ids), default=0)
 
-    def common_letters(s1, s2):
-        '''
-        Returns common letters between two strings by removing differing character from first string.
+    for index in range(max_length):
+        buckets = defaultdict(list)
+
+        for id_ in list_of_ids:
+            if index >= len(id_):
+                continue
+            common_letters = id_[:index] + id_[index + 1:]
+            for other_id in buckets[common_letters]:
+                # Equal IDs collide on every position, but don't differ at all
+                if other_id != id_:
+                    yield other_id, id_, common_letters
+            buckets[common_letters].append(id_)
 
-        Example:
-            a = 'abcdef1g'
-            b = 'abcdef2g'
-            print(common_letters(a, b))
-            'abcdefg'
+
+def within_distance(s1, s2, k):
+    '''Returns True if two strings of equal length differ by at most k letters.'''
+    differences = 0
+
+    for c1, c2 in zip(s1, s2):
+        if c1 != c2:
+            differences += 1
+            if differences > k:
+                return False
+
+    return True
+
+
+class HammingIndex():
+    '''
+    Index of box IDs for finding IDs that differ by at most k letters.
+
+    Each ID is split into k + 1 segments. Two IDs of equal length that differ
+    by at most k letters must have at least one equal segment (pigeonhole
+    principle), so only IDs sharing a segment are compared.
+
+    Example:
+        index = HammingIndex(['abcde', 'abcxy', 'vwxyz'], k=2)
+        print(index.query('abzde'))
+        ['abcde']
+        print(index.pairs())
+        [('abcde', 'abcxy')]
+    '''
+
+    def __init__(self, list_of_ids, k):
+
+        self.k = k
+        self.ids = []
+        self.buckets = defaultdict(list)
+        self.add(list_of_ids)
+
+    def segments(self, id_):
+        '''Generator that yields keys of all segments of the ID.'''
+        length = len(id_)
+        parts = self.k + 1
+
+        for part in range(parts):
+            start = length * part // parts
+            end = length * (part + 1) // parts
+            yield (length, part, id_[start:end])
+
+    def add(self, list_of_ids):
+        '''Adds IDs to the index.'''
+        for id_ in list_of_ids:
+            position = len(self.ids)
+            self.ids.append(id_)
+            for key in self.segments(id_):
+                self.buckets[key].append(position)
+
+    def candidates(self, id_):
+        '''Returns positions of indexed IDs that share a segment with the ID.'''
+        positions = set()
+        for key in self.segments(id_):
+            positions.update(self.buckets.get(key, ()))
+        return positions
+
+    def query(self, id_):
+        '''Returns indexed IDs that differ from the ID by at most k letters.'''
+        matches = []
+        for position in sorted(self.candidates(id_)):
+            other_id = self.ids[position]
+            if within_distance(id_, other_id, self.k):
+                matches.append(other_id)
+        return matches
+
+    def query_batch(self, list_of_ids):
         '''
-        for index, (c1, c2) in enumerate(zip(s1, s2)):
-            if c1 != c2:
-                return s1[:index] + s1[index + 1:]
+        Queries many IDs against the index without adding them, returns
+        a dict with matching indexed IDs for each of them.
+        '''
+        return {id_: self.query(id_) for id_ in list_of_ids}
+
+    def pairs(self):
+        '''Returns all pairs of indexed IDs that differ by at most k letters.'''
+        pairs = []
+        for position, id_ in enumerate(self.ids):
+            for other_position in sorted(self.candidates(id_)):
+                if other_position <= position:
+                    continue
+                other_id = self.ids[other_position]
+                if within_distance(id_, other_id, self.k):
+                    pairs.append((id_, other_id))
+        return pairs
+
+
+def part_two(list_of_ids, all_pairs=False):
+    '''
+    Question:
+            What letters are common between the two correct box IDs?
+
+    Finds common letters of the IDs that differ by exactly one
+    character (e.g., 'fghij' and 'fguij'). If all_pairs is True, returns a
+    list with every such pair of IDs and their common letters instead.
+    '''
+
+    pairs = near_duplicates(list_of_ids)
+
+    if all_pairs:
+        return list(pairs)
 
-    for s1, s2 in itertools.combinations(list_of_ids, 2):
-        are_different = differ_by_one_letter(s1, s2)
-        if are_different:
-            common_letters = common_letters(s1, s2)
-            return common_letters
+    for _, _, common_letters in pairs:
+        return common_letters
 
 
 def main():
 
     input_file = pathlib.Path(__file__).resolve().parent / 'input.txt'
-    ids = [line.strip() for line in input_file.open()]
+    data = input_file.read_bytes()
+    ids = data.decode().split()
 
-    print(f'Part One: {part_one(ids)}')
+    print(f'Part One: {part_one(data)}')
     print(f'Part Two: {part_two(ids)}')
 
 
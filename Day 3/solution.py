@@ -1,59 +1,448 @@
 """Solution to Advent of Code 2018, Day 3: No Matter How You Slice It (https://adventofcode.com/2018/day/3)."""
+import bisect
 import re
 import pathlib
 from collections import defaultdict
 
+# Maps how many times an inch was claimed to how many times it is claimed
+# after one more claim. Counts stop at 2, since only "two or more" matters.
+CLAIM_INCH = bytes([1] + [2] * 255)
 
-def part_one(claims):
+# Largest fabric (in square inches) that is counted on a grid, claims on
+# larger fabric are handled with a sweep line
+MAX_GRID_AREA = 10 ** 8
+
+
+def get_claim_data(claim_str):
     '''
-    Question:
-        How many square inches of fabric are within two or more claims?
+    Parses claim string and returns its id, x, y, width, height.
 
-    Counts how many times each inch has been claimed, then finds square inches
-    of fabric that are within two or more claims.
+    Example:
+        claim_str = "#1 @ 1,3: 4x4"
+        print(get_claim_data(claim_str))
+        1, 1, 3, 4, 4
     '''
+    claim_id, x, y, width, height = map(int, re.findall(r'\d+', claim_str))
+    return claim_id, x, y, width, height
 
-    def get_claim_data(claim_str):
-        '''
-        Parses claim string and returns its x, y, width, height.
 
-        Example:
-            claim_str = "#3 @ 1,3: 4x4"
-            print(get_claim_data(claim_str))
-            1, 3, 4, 4
-        '''
-        _, x, y, width, height = map(int, re.findall(r'\d+', claim_str))
-        return x, y, width, height
+class Fabric():
+    '''
+    Class representing a sheet of fabric as a flat grid of bytes, one byte
+    per square inch, that holds how many times the inch has been claimed
+    (0, 1, or 2 for two or more). The sheet is just large enough to fit all
+    the claims.
+    '''
+
+    def __init__(self, claims):
+
+        self.width = max((x + width for _, x, _, width, _ in claims), default=0)
+        self.height = max((y + height for _, _, y, _, height in claims), default=0)
+        self.grid = bytearray(self.width * self.height)
+
+        for claim in claims:
+            self.claim(claim)
+
+    def rows(self, claim):
+        '''Generator that yields start and end of each row of the claim in the grid.'''
+        _, x, y, width, height = claim
+        for row in range(y, y + height):
+            start = row * self.width + x
+            yield start, start + width
+
+    def claim(self, claim):
+        '''Claims all inches of the claim, a row slice at a time.'''
+        for start, end in self.rows(claim):
+            self.grid[start:end] = self.grid[start:end].translate(CLAIM_INCH)
+
+    def overlaps(self, claim):
+        '''Returns True if any inch of the claim is within two or more claims.'''
+        return any(self.grid.find(2, start, end) != -1
+                   for start, end in self.rows(claim))
+
+    def overlapped_inches(self):
+        '''Returns how many inches are within two or more claims.'''
+        return self.grid.count(2)
+
+
+class CoverageTree():
+    '''
+    Segment tree over the elementary intervals between sorted y coordinates.
+    Holds how many claims currently cover each interval, and the total
+    length covered by at least one and at least two claims.
+    '''
+
+    def __init__(self, ys):
+
+        self.ys = ys
+        size = 4 * max(len(ys) - 1, 1)
+        self.count = [0] * size
+        self.once = [0] * size
+        self.twice = [0] * size
+
+    def add(self, y_start, y_end, delta, node=1, low=0, high=None):
+        '''Adds delta claims covering [y_start, y_end) (indexes of ys).'''
+        if high is None:
+            high = len(self.ys) - 1
+        if y_end <= low or high <= y_start:
+            return
+
+        if y_start <= low and high <= y_end:
+            self.count[node] += delta
+        else:
+            middle = (low + high) // 2
+            self.add(y_start, y_end, delta, 2 * node, low, middle)
+            self.add(y_start, y_end, delta, 2 * node + 1, middle, high)
+
+        self.update(node, low, high)
+
+    def update(self, node, low, high):
+        '''Recalculates covered lengths of the node from its count and children.'''
+        count = self.count[node]
+        length = self.ys[high] - self.ys[low]
+        leaf = high - low == 1
+
+        if leaf:
+            children_once = children_twice = 0
+        else:
+            children_once = self.once[2 * node] + self.once[2 * node + 1]
+            children_twice = self.twice[2 * node] + self.twice[2 * node + 1]
+
+        if count >= 2:
+            self.once[node] = length
+            self.twice[node] = length
+        elif count == 1:
+            self.once[node] = length
+            self.twice[node] = children_once
+        else:
+            self.once[node] = children_once
+            self.twice[node] = children_twice
+
+    def covered_twice(self):
+        '''Returns the length covered by two or more claims.'''
+        return self.twice[1]
+
+
+def overlapped_area(claims):
+    '''
+    Returns how many square inches are within two or more claims, using a
+    sweep line over the left and right edges of the claims. The area depends
+    only on the number of claims, not on the size of the fabric.
+    '''
+    ys = sorted({y for _, _, y, _, _ in claims} |
+                {y + height for _, _, y, _, height in claims})
+    y_index = {y: index for index, y in enumerate(ys)}
+
+    # Left edge adds the claim to the sweep line, the right edge removes it
+    edges = []
+    for _, x, y, width, height in claims:
+        edges.append((x, 1, y_index[y], y_index[y + height]))
+        edges.append((x + width, -1, y_index[y], y_index[y + height]))
+    edges.sort()
+
+    tree = CoverageTree(ys)
+    area = 0
+    previous_x = edges[0][0] if edges else 0
+
+    for x, delta, y_start, y_end in edges:
+        area += tree.covered_twice() * (x - previous_x)
+        tree.add(y_start, y_end, delta)
+        previous_x = x
+
+    return area
+
+
+class FenwickTree():
+    '''Fenwick tree (binary indexed tree) that counts added positions.'''
+
+    def __init__(self, size):
+
+        self.tree = [0] * (size + 1)
+
+    def add(self, position):
+        '''Adds one to the position (0-based).'''
+        position += 1
+        while position < len(self.tree):
+            self.tree[position] += 1
+            position += position & -position
+
+    def count(self, position):
+        '''Returns how many added positions are less than or equal to position.'''
+        position += 1
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+
+def dominance_counts(points, queries):
+    '''
+    For each query (x, y) counts how many points (px, py) have px <= x and
+    py <= y, sweeping over x with a Fenwick tree over y.
+    '''
+    ys = sorted({y for _, y in points})
+    tree = FenwickTree(len(ys))
+    points = sorted(points)
+
+    counts = [0] * len(queries)
+    order = sorted(range(len(queries)), key=lambda index: queries[index])
+    added = 0
+
+    for index in order:
+        x, y = queries[index]
+        while added < len(points) and points[added][0] <= x:
+            tree.add(bisect.bisect_left(ys, points[added][1]))
+            added += 1
+        counts[index] = tree.count(bisect.bisect_right(ys, y) - 1)
+
+    return counts
+
+
+def isolated_claims(claims):
+    '''
+    Returns IDs of claims that don't overlap any other claim.
+
+    A claim doesn't intersect another one if the other one is entirely to the
+    left (L), right (R), below (B) or above (T) of it. These sets can only
+    intersect pairwise as LB, LT, RB and RT, so the number of claims that
+    don't intersect a claim is L + R + B + T - LB - LT - RB - RT. All the
+    counts are found with sorting and dominance counting.
+    '''
+    lefts = sorted(x for _, x, _, _, _ in claims)
+    rights = sorted(x + width for _, x, _, width, _ in claims)
+    bottoms = sorted(y for _, _, y, _, _ in claims)
+    tops = sorted(y + height for _, _, y, _, height in claims)
+
+    # Corners of claims, negated where "greater than or equal" is needed
+    left_bottom = dominance_counts(
+        [(x + w, y + h) for _, x, y, w, h in claims],
+        [(x, y) for _, x, y, _, _ in claims])
+    left_top = dominance_counts(
+        [(x + w, -y) for _, x, y, w, _ in claims],
+        [(x, -(y + h)) for _, x, y, _, h in claims])
+    right_bottom = dominance_counts(
+        [(-x, y + h) for _, x, y, _, h in claims],
+        [(-(x + w), y) for _, x, y, w, _ in claims])
+    right_top = dominance_counts(
+        [(-x, -y) for _, x, y, _, _ in claims],
+        [(-(x + w), -(y + h)) for _, x, y, w, h in claims])
+
+    isolated = []
+    for index, (claim_id, x, y, width, height) in enumerate(claims):
+        left = bisect.bisect_right(rights, x)
+        right = len(lefts) - bisect.bisect_left(lefts, x + width)
+        bottom = bisect.bisect_right(tops, y)
+        top = len(bottoms) - bisect.bisect_left(bottoms, y + height)
 
-    def claimed_inches(x, y, width, height):
+        apart = (left + right + bottom + top
+                 - left_bottom[index] - left_top[index]
+                 - right_bottom[index] - right_top[index])
+
+        # Every claim except itself and those apart from it overlaps it
+        if len(claims) - 1 - apart == 0:
+            isolated.append(claim_id)
+
+    return isolated
+
+
+def intersect(rectangle1, rectangle2):
+    '''Returns True if two rectangles (x, y, width, height) share an inch.'''
+    x1, y1, width1, height1 = rectangle1
+    x2, y2, width2, height2 = rectangle2
+    return (x1 < x2 + width2 and x2 < x1 + width1 and
+            y1 < y2 + height2 and y2 < y1 + height1)
+
+
+class ClaimIndex():
+    '''
+    Spatial index of claims. Fabric is divided into square cells, and each
+    claim is put into buckets of the cells it covers, so a query only
+    checks claims from the cells it covers.
+
+    Example:
+        index = ClaimIndex([(1, 1, 3, 4, 4), (2, 3, 1, 4, 4), (3, 5, 5, 2, 2)])
+        print(index.query(0, 0, 2, 4))
+        [1]
+        print(index.intersecting(1))
+        [2]
+        print(index.isolated())
+        [3]
+    '''
+
+    def __init__(self, claims, cell_size=None):
+
+        self.claims = {claim_id: (x, y, width, height)
+                       for claim_id, x, y, width, height in claims}
+
+        # By default cells are about the size of an average claim
+        if cell_size is None:
+            sides = sum(max(width, height)
+                        for _, _, width, height in self.claims.values())
+            cell_size = max(1, sides // max(len(self.claims), 1))
+        self.cell_size = cell_size
+
+        self.buckets = defaultdict(list)
+        for claim_id, rectangle in self.claims.items():
+            for cell in self.cells(*rectangle):
+                self.buckets[cell].append(claim_id)
+
+        # First and last column and row of cells that have claims
+        columns = [column for column, _ in self.buckets]
+        rows = [row for _, row in self.buckets]
+        self.extent = (min(columns, default=0), max(columns, default=-1),
+                       min(rows, default=0), max(rows, default=-1))
+
+    def cell_range(self, x, y, width, height):
+        '''Returns first and last column and row of cells covered by the rectangle.'''
+        return (x // self.cell_size, (x + width - 1) // self.cell_size,
+                y // self.cell_size, (y + height - 1) // self.cell_size)
+
+    def cells(self, x, y, width, height):
+        '''Generator that yields all cells covered by the rectangle.'''
+        first_column, last_column, first_row, last_row = self.cell_range(
+            x, y, width, height)
+
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                yield (column, row)
+
+    def occupied_buckets(self, x, y, width, height):
         '''
-        Generator that yields all inches claimed by given input.
-
-        Example:
-            # x = 1, y = 3, width = 2, height = 2
-            claimed = (1, 3, 2, 2)
-            for inch in claimed_inches(*claimed):
-                print(inch)
-            (1, 3)
-            (1, 4)
-            (2, 3)
-            (2, 4)
+        Generator that yields buckets of cells covered by the rectangle that
+        have claims. Cells outside of the claims are skipped, and if the
+        rectangle covers more cells than there are buckets, buckets are
+        checked instead of cells.
         '''
-        for x_i in range(width):
-            for y_i in range(height):
-                yield (x + x_i, y + y_i)
+        first_column, last_column, first_row, last_row = self.cell_range(
+            x, y, width, height)
 
-    # Counts how many times each inch has been claimed
-    overlaps = defaultdict(int)
-    for claim in claims:
-        x, y, width, height = get_claim_data(claim)
-        for inch in claimed_inches(x, y, width, height):
-            overlaps[inch] += 1
+        # Clamps the cells to the ones that can have claims
+        min_column, max_column, min_row, max_row = self.extent
+        first_column = max(first_column, min_column)
+        last_column = min(last_column, max_column)
+        first_row = max(first_row, min_row)
+        last_row = min(last_row, max_row)
+        if first_column > last_column or first_row > last_row:
+            return
+
+        covered = (last_column - first_column + 1) * (last_row - first_row + 1)
+        if covered > len(self.buckets):
+            for (column, row), bucket in self.buckets.items():
+                if (first_column <= column <= last_column and
+                        first_row <= row <= last_row):
+                    yield bucket
+            return
+
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                bucket = self.buckets.get((column, row))
+                if bucket:
+                    yield bucket
+
+    def query(self, x, y, width, height):
+        '''Returns sorted IDs of claims that intersect the rectangle.'''
+        rectangle = (x, y, width, height)
+        found = set()
+
+        for bucket in self.occupied_buckets(x, y, width, height):
+            for claim_id in bucket:
+                if claim_id not in found and intersect(rectangle, self.claims[claim_id]):
+                    found.add(claim_id)
 
-    # Finds square inches of fabric that are in two or more claims
-    total_overlaps = len(
-        [times for inch, times in overlaps.items() if times > 1])
-    return total_overlaps
+        return sorted(found)
+
+    def intersecting(self, claim_id):
+        '''Returns sorted IDs of other claims that intersect the claim.'''
+        found = self.query(*self.claims[claim_id])
+        found.remove(claim_id)
+        return found
+
+    def isolated(self):
+        '''Returns sorted IDs of claims that don't intersect any other claim.'''
+        return sorted(claim_id for claim_id in self.claims
+                      if not self.intersecting(claim_id))
+
+
+class OverlapTracker():
+    '''
+    Tracks overlaps of claims that arrive one at a time. For every claimed
+    inch remembers the ID of the claim that owns it, or None if it is within
+    two or more claims, so each new claim costs only its own area.
+
+    Example:
+        tracker = OverlapTracker()
+        tracker.add((1, 1, 3, 4, 4))
+        tracker.add((3, 5, 5, 2, 2))
+        print(tracker.overlapped, tracker.isolated)
+        0 {1, 3}
+        tracker.add((2, 3, 1, 4, 4))
+        print(tracker.overlapped, tracker.isolated)
+        4 {3}
+    '''
+
+    def __init__(self, claims=()):
+
+        self.owners = {}
+        # How many inches are within two or more claims
+        self.overlapped = 0
+        # IDs of claims that don't overlap any other claim
+        self.isolated = set()
+
+        self.add_many(claims)
+
+    def add(self, claim):
+        '''Adds a claim (id, x, y, width, height) and updates the overlaps.'''
+        claim_id, x, y, width, height = claim
+        overlaps = False
+
+        for inch_x in range(x, x + width):
+            for inch_y in range(y, y + height):
+                inch = (inch_x, inch_y)
+
+                if inch not in self.owners:
+                    self.owners[inch] = claim_id
+                    continue
+
+                owner = self.owners[inch]
+                if owner is not None:
+                    # Inch is claimed the second time
+                    self.owners[inch] = None
+                    self.overlapped += 1
+                    self.isolated.discard(owner)
+                overlaps = True
+
+        if not overlaps:
+            self.isolated.add(claim_id)
+
+    def add_many(self, claims):
+        '''Adds claims one by one.'''
+        for claim in claims:
+            self.add(claim)
+
+
+def fits_grid(claims):
+    '''Returns True if fabric with all the claims is small enough for a grid.'''
+    width = max((x + width for _, x, _, width, _ in claims), default=0)
+    height = max((y + height for _, _, y, _, height in claims), default=0)
+    return width * height <= MAX_GRID_AREA
+
+
+def part_one(claims):
+    '''
+    Question:
+        How many square inches of fabric are within two or more claims?
+
+    Counts how many times each inch has been claimed, then finds square inches
+    of fabric that are within two or more claims.
+    '''
+    claims = [get_claim_data(claim) for claim in claims]
+
+    if not fits_grid(claims):
+        return overlapped_area(claims)
+
+    fabric = Fabric(claims)
+    return fabric.overlapped_inches()
 
 
 def part_two(claims):
@@ -61,60 +450,23 @@ def part_two(claims):
     Question:
         What is the ID of the only claim that doesn't overlap?
 
-    Counts how many times each inch has been claimed, then finds ID of claims
-    that has overlap, and finally finds ID of claim that doesn't overlap by
-    subtracting from all claim IDs overlap claim IDs.
+    Counts how many times each inch has been claimed, then finds ID of claim
+    that has no inch within two or more claims.
     '''
+    claims = [get_claim_data(claim) for claim in claims]
 
-    def get_claim_data(claim_str):
-        '''
-        Parses claim string and returns its id, x, y, width, height.
+    if not fits_grid(claims):
+        # ID of the first claim that doesn't overlap, or None if all do
+        return next(iter(isolated_claims(claims)), None)
 
-        Example:
-            claim_str = "#1 @ 1,3: 4x4"
-            print(get_claim_data(claim_str))
-            1, 1, 3, 4, 4
-        '''
-        claim_id, x, y, width, height = map(int, re.findall(r'\d+', claim_str))
-        return claim_id, x, y, width, height
+    fabric = Fabric(claims)
 
-    def claimed_inches(x, y, width, height):
-        '''
-        Generator that yields all inches claimed by given input.
-
-        Example:
-            # x = 1, y = 3, width = 2, height = 2
-            claimed = (1, 3, 2, 2)
-            for inch in claimed_inches(*claimed):
-                print(inch)
-            (1, 3)
-            (1, 4)
-            (2, 3)
-            (2, 4)
-        '''
-        for x_i in range(width):
-            for y_i in range(height):
-                yield (x + x_i, y + y_i)
-
-    # Counts how many times each inch has been claimed
-    overlaps = defaultdict(int)
     for claim in claims:
-        _, x, y, width, height = get_claim_data(claim)
-        for inch in claimed_inches(x, y, width, height):
-            overlaps[inch] += 1
+        if not fabric.overlaps(claim):
+            claim_id = claim[0]
+            return claim_id
 
-    # Finds ID of claims that has overlap
-    all_claims = {claim_id for claim_id, *_ in map(get_claim_data, claims)}
-    overlap_claims = set()
-    for claim in claims:
-        claim_id, x, y, width, height = get_claim_data(claim)
-        for inch in claimed_inches(x, y, width, height):
-            if overlaps[inch] > 1:
-                overlap_claims.add(claim_id)
-
-    # Finds ID of claim that doesn't overlap
-    result = all_claims - overlap_claims
-    return result.pop()
+    return None
 
 
 def main():
@@ -1,148 +1,203 @@
 """Solution to Advent of Code 2018, Day 4: Repose Record (https://adventofcode.com/2018/day/4)."""
+import contextlib
+import heapq
 import pathlib
-from datetime import datetime
-from collections import Counter, defaultdict
+from array import array
 
+# Kinds of events in records
+BEGINS_SHIFT = 0
+FALLS_ASLEEP = 1
+WAKES_UP = 2
 
-def part_one(records):
-    '''
-    Question:
-        Find the guard that has the most minutes asleep. What is the ID of the
-        guard you chose multiplied by the minute you chose?
+EVENT_KINDS = {'G': BEGINS_SHIFT, 'f': FALLS_ASLEEP, 'w': WAKES_UP}
 
-    Iterates over records, parses time and guard action, then adds all minutes
-    when guard was asleep as collections.Counter() object in guards dict.
-    Finally finds ID of the guard that has the most minutes asleep and minute
-    that guard spend asleep the most, and multiplies them.
-    '''
-
-    def get_datetime(record):
-        '''Parses string of record and returns datetime object.'''
 
-        # '[1518-05-30 00:04] ...' -> '1518-05-30 00:04'
-        date_time_string = record.split('] ')[0].lstrip('[')
-        # '1518-05-30 00:04' -> datetime.datetime(1518, 5, 30, 0, 4)
-        date_time = datetime.strptime(date_time_string, '%Y-%m-%d %H:%M')
-        return date_time
-
-    def get_guard_id(record):
-        '''Parses string of record and returns guard ID.'''
+def parse_events(records):
+    '''
+    Generator that parses records, which must already be in chronological
+    order, and yields (minute, kind, guard_id) for each of them, where
+    guard_id is the ID of the guard on duty.
+
+    Records have fixed layout, so fields are sliced by offset instead of
+    parsing the date and time, e.g. '[1518-05-30 00:04] Guard #2417 begins shift'
+    has minute at [15:17], first letter of the action at [19] and guard ID
+    starting at [26].
+    '''
+    guard_id = None
+    for record in records:
+        minute = int(record[15:17])
+        kind = EVENT_KINDS[record[19]]
+        if kind == BEGINS_SHIFT:
+            # '2417 begins shift' -> 2417
+            guard_id = int(record[26:record.index(' ', 26)])
+        yield minute, kind, guard_id
 
-        # '[1518-05-30 00:04] Guard #2417 begins shift' -> '2417 begins shift'
-        guard_action = record.split('#')[1]
-        # '2417 begins shift' -> 2417
-        guard_id = guard_action.split()[0]
-        return guard_id
 
-    # Because strings are in ISO-8601 format we can simply sort list directly,
-    # without parsing it for dates to sort later
-    records.sort()
+def parse_records(records):
+    '''
+    Parses records in any order, returns generator of parsed records in
+    chronological order.
+
+    Example:
+        records = ['[1518-11-01 00:05] falls asleep',
+                   '[1518-11-01 00:00] Guard #10 begins shift']
+        print(list(parse_records(records)))
+        [(0, 0, 10), (5, 1, 10)]
+    '''
+    # Because strings are in ISO-8601 format we can simply sort them directly,
+    # without parsing them for dates to sort later
+    return parse_events(sorted(records))
 
-    guards = defaultdict(Counter)
 
-    for record in records:
-        time = get_datetime(record)
-        if '#' in record:
-            guard_id = get_guard_id(record)
-        elif 'falls' in record:
-            fell_asleep_time = time
-        elif 'wakes' in record:
-            woke_up_time = time
-            minutes = []
-            for minute in range(fell_asleep_time.minute, woke_up_time.minute):
-                minutes.append(minute % 60)
-            guards[guard_id].update(Counter(minutes))
+def merge_shards(paths):
+    '''
+    Generator that lazily merges records from files, each of which is
+    already sorted, and yields them in chronological order. Only one record
+    per file is held in memory at a time.
+    '''
+    with contextlib.ExitStack() as stack:
+        shards = []
+        for path in paths:
+            shard = stack.enter_context(open(path))
+            shards.append(line.strip() for line in shard if line.strip())
 
-    # Total minutes asleep of each guard
-    total_minutes_asleep = []
-    for guard_id, counter in guards.items():
-        total_minutes_asleep.append((sum(counter.values()), guard_id))
+        yield from heapq.merge(*shards)
 
-    # ID of the guard that has the most minutes asleep
-    _, guard_id = max(total_minutes_asleep)
 
-    # Minute that guard spend asleep the most
-    minute = guards[guard_id].most_common()[0][0]
+class SleepTable():
+    '''
+    Class representing how many times each guard was asleep on each minute
+    of the midnight hour, as an array of 60 counts per guard.
+    '''
 
-    # ID of the guard that has the most minutes asleep multiplied by the minute
-    # that he spends asleep the most
-    result = int(guard_id) * minute
+    def __init__(self, events=()):
+
+        self.minutes = {}
+        # Total minutes asleep of each guard
+        self.totals = {}
+        # Guard on duty and the minute they fell asleep (None if awake), kept
+        # between calls, so a nap can span two batches of events
+        self.guard_id = None
+        self.fell_asleep_minute = None
+        self.add_events(events)
+
+    def add_nap(self, guard_id, fell_asleep_minute, woke_up_minute):
+        '''Adds minutes from fell_asleep_minute until woke_up_minute to the guard.'''
+        if guard_id not in self.minutes:
+            self.minutes[guard_id] = array('I', [0] * 60)
+            self.totals[guard_id] = 0
+
+        counts = self.minutes[guard_id]
+        for minute in range(fell_asleep_minute, woke_up_minute):
+            counts[minute] += 1
+        self.totals[guard_id] += woke_up_minute - fell_asleep_minute
+
+    def add_events(self, events):
+        '''
+        Adds naps from parsed records, which can continue previous ones. Naps
+        before any guard is known to be on duty are skipped.
+        '''
+        for minute, kind, guard_id in events:
+            # Batch parsed separately doesn't know the guard on duty at its start
+            if guard_id is not None:
+                self.guard_id = guard_id
+
+            if kind == FALLS_ASLEEP:
+                self.fell_asleep_minute = minute
+            elif kind == WAKES_UP and self.fell_asleep_minute is not None:
+                if self.guard_id is not None:
+                    self.add_nap(self.guard_id, self.fell_asleep_minute, minute)
+                self.fell_asleep_minute = None
+
+    def sleepiest_minute(self, guard_id):
+        '''
+        Returns the minute that guard spend asleep the most and how many
+        times guard was asleep on it.
+        '''
+        counts = self.minutes[guard_id]
+        minute = max(range(60), key=counts.__getitem__)
+        return minute, counts[minute]
+
+    def top_guards(self, k=1):
+        '''Returns IDs of k guards that have the most minutes asleep.'''
+        totals = ((total, guard_id) for guard_id, total in self.totals.items())
+        return [guard_id for _, guard_id in heapq.nlargest(k, totals)]
+
+    def minute_leaders(self):
+        '''
+        Returns list with the guard that is most frequently asleep on each
+        minute and how many times, or (None, 0) if nobody slept on it.
+        '''
+        leaders = [(None, 0)] * 60
+        for guard_id, counts in self.minutes.items():
+            for minute, count in enumerate(counts):
+                leader_id, leader_count = leaders[minute]
+                if (count > leader_count or
+                        (count == leader_count > 0 and guard_id > leader_id)):
+                    leaders[minute] = (guard_id, count)
+        return leaders
+
+    def strategy_one(self):
+        '''
+        Returns ID of the guard that has the most minutes asleep multiplied
+        by the minute that guard spends asleep the most.
+        '''
+        guard_id = self.top_guards()[0]
+        minute, _ = self.sleepiest_minute(guard_id)
+        return guard_id * minute
+
+    def strategy_two(self):
+        '''
+        Returns ID of the guard that is most frequently asleep on the same
+        minute multiplied by that minute.
+        '''
+        leaders = self.minute_leaders()
+        minute = max(range(60), key=lambda minute: leaders[minute][1])
+        guard_id, _ = leaders[minute]
+        return guard_id * minute
+
+
+def load_shards(paths):
+    '''Returns SleepTable of records streamed from sorted shard files.'''
+    return SleepTable(parse_events(merge_shards(paths)))
+
+
+def part_one(events):
+    '''
+    Question:
+        Find the guard that has the most minutes asleep. What is the ID of the
+        guard you chose multiplied by the minute you chose?
 
-    return result
+    Counts minutes when each guard was asleep from parsed records. Finds ID
+    of the guard that has the most minutes asleep and minute that guard
+    spend asleep the most, and multiplies them.
+    '''
+    table = SleepTable(events)
+    return table.strategy_one()
 
 
-def part_two(records):
+def part_two(events):
     '''
     Question:
         Of all guards, which guard is most frequently asleep on the same minute?
         What is the ID of the guard you chose multiplied by the minute you chose?
 
-    Iterates over records, parses time and guard action, then adds all minutes
-    when guard was asleep as collections.Counter() object in guards dict.
-    Finally of all guards, finds which guard is most frequently asleep on the
-    same minute, that minute, and multiplies them.
+    Counts minutes when each guard was asleep from parsed records. Of all
+    guards, finds which guard is most frequently asleep on the same minute,
+    that minute, and multiplies them.
     '''
-
-    def get_datetime(record):
-        '''Parses string of record and returns datetime object.'''
-
-        # '[1518-05-30 00:04] ...' -> '1518-05-30 00:04'
-        date_time_string = record.split('] ')[0].lstrip('[')
-        # '1518-05-30 00:04' -> datetime.datetime(1518, 5, 30, 0, 4)
-        date_time = datetime.strptime(date_time_string, '%Y-%m-%d %H:%M')
-        return date_time
-
-    def get_guard_id(record):
-        '''Parses string of record and returns guard ID.'''
-
-        # '[1518-05-30 00:04] Guard #2417 begins shift' -> '2417 begins shift'
-        guard_action = record.split('#')[1]
-        # '2417 begins shift' -> 2417
-        guard_id = guard_action.split()[0]
-        return guard_id
-
-    # Because strings are in ISO-8601 format we can simply sort list directly,
-    # without parsing it for dates to sort later
-    records.sort()
-
-    guards = defaultdict(Counter)
-
-    for record in records:
-        time = get_datetime(record)
-        if '#' in record:
-            guard_id = get_guard_id(record)
-        elif 'falls' in record:
-            fell_asleep_time = time
-        elif 'wakes' in record:
-            woke_up_time = time
-            minutes = []
-            for minute in range(fell_asleep_time.minute, woke_up_time.minute):
-                minutes.append(minute % 60)
-            guards[guard_id].update(Counter(minutes))
-
-    # Most frequently asleep minute of each guard
-    most_asleep_minutes = []
-    for guard_id, counter in guards.items():
-        most_asleep_minutes.append((counter.most_common()[0][::-1], guard_id))
-
-    # Most frequently asleep minute and guard ID that most frequently asleep on
-    # that minute
-    (_, minute), guard_id = max(most_asleep_minutes)
-
-    # ID of the guard that is most frequently asleep on the same minute
-    # multiplied by that minute
-    result = int(guard_id) * minute
-
-    return result
+    table = SleepTable(events)
+    return table.strategy_two()
 
 
 def main():
 
     input_file = pathlib.Path(__file__).resolve().parent / 'input.txt'
     records = [record.strip() for record in input_file.open()]
+    events = list(parse_records(records))
 
-    print(f'Part One: {part_one(records)}')
-    print(f'Part Two: {part_two(records)}')
+    print(f'Part One: {part_one(events)}')
+    print(f'Part Two: {part_two(events)}')
 
 
 if __name__ == '__main__':
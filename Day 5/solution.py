@@ -1,176 +1,250 @@
 """Solution to Advent of Code 2018, Day 5: Alchemical Reduction (https://adventofcode.com/2018/day/5)."""
+import collections
+import itertools
+import mmap
+import os
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
 from string import ascii_lowercase
 
+# Size in bytes of a part of the polymer reacted by one worker
+CHUNK_SIZE = 2 ** 22
 
-def part_one(polymer):
-    '''
-    Question:
-        How many units remain after fully reacting the polymer you scanned?
+WHITESPACE = b' \t\r\n'
 
-    Performs a reaction on the polymer, gets the remaining units in list.
-    Result is the length of that list.
-    '''
 
-    def can_react(unit1, unit2):
-        '''
-        Returns True if given units are same type and have opposite polarities.
+def react(polymer):
+    '''
+    Reacts the polymer given as bytes, returns remaining units as bytes.
 
-        >>>can_react('a', 'A')
-        True
-        >>>can_react('a', 'B')
-        False
-        '''
+    Units are ASCII letters, and lower and upper cases of a letter differ only
+    by the bit 32, so two units react when unit1 ^ unit2 == 32. Remaining
+    units are kept on a stack preallocated for the whole polymer.
 
-        def same_type(unit1, unit2):
-            '''
-            Returns True if given units are same type.
+    dabAcCaCBAcCcaDA  The first 'cC' is removed.
+    dabAaCBAcCcaDA    This creates 'Aa', which is removed.
+    dabCBAcCcaDA      Either 'cC' or 'Cc' are removed.
+    dabCBAcaDA        No further actions can be taken.
 
-            >>>same_type('e', 'E')
-            True
-            >>>same_type('e', 'c')
-            False
-            '''
+    >>>react(b'dabAcCaCBAcCcaDA')
+    b'dabCBAcaDA'
+    '''
 
-            return unit1.lower() == unit2.lower()
+    remaining_units = bytearray(len(polymer))
+    top = 0
 
-        def opposite_polarity(unit1, unit2):
-            '''
-            Returns True if given units are same type.
+    for unit in polymer:
+        if top and unit ^ remaining_units[top - 1] == 32:
+            top -= 1
+        else:
+            remaining_units[top] = unit
+            top += 1
 
-            >>>opposite_polarity('e', 'E')
-            True
-            >>>opposite_polarity('e', 'e')
-            False
-            '''
+    return bytes(remaining_units[:top])
 
-            return ((unit1.isupper() and unit2.islower()) or
-                    (unit1.islower() and unit2.isupper()))
 
-        return (same_type(unit1, unit2) and
-                opposite_polarity(unit1, unit2))
+class PolymerReducer():
+    '''
+    Class that reacts a polymer fed in parts, e.g. as it arrives from a pipe.
+    Only remaining units are kept, so memory is proportional to the length
+    of the reacted polymer. Whitespace between units is ignored.
+
+    Example:
+        reducer = PolymerReducer()
+        reducer.feed(b'dabAcCaC')
+        reducer.feed(b'BAcCcaDA\n')
+        print(reducer.length, reducer.snapshot())
+        10 b'dabCBAcaDA'
+    '''
 
-    def do_reaction(polymer):
-        '''
-        Reacts the polymer, returns remaining units.
+    def __init__(self):
 
-        dabAcCaCBAcCcaDA  The first 'cC' is removed.
-        dabAaCBAcCcaDA    This creates 'Aa', which is removed.
-        dabCBAcCcaDA      Either 'cC' or 'Cc' are removed.
-        dabCBAcaDA        No further actions can be taken.
-        '''
+        self.remaining_units = bytearray()
 
-        remaining_units = []
+    def feed(self, chunk):
+        '''Reacts the next part of the polymer with the remaining units.'''
+        remaining_units = self.remaining_units
 
-        for unit in polymer:
-            if remaining_units and can_react(unit, remaining_units[-1]):
+        for unit in chunk.translate(None, WHITESPACE):
+            if remaining_units and unit ^ remaining_units[-1] == 32:
                 remaining_units.pop()
             else:
                 remaining_units.append(unit)
 
-        return remaining_units
+    @property
+    def length(self):
+        '''How many units remain after reacting everything fed so far.'''
+        return len(self.remaining_units)
 
-    # Performs a reaction and gets the remaining units
-    units = do_reaction(polymer)
-    # Returns how many units remaining
-    return len(units)
+    def snapshot(self):
+        '''Returns remaining units as bytes.'''
+        return bytes(self.remaining_units)
 
 
-def part_two(polymer):
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    '''Generator that yields consecutive parts of the file as bytes.'''
+    with open(path, 'rb') as polymer_file:
+        while True:
+            chunk = polymer_file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def merge_reacted(remaining_units, polymer):
     '''
-    Question:
-        What is the length of the shortest polymer you can produce by removing
-        all units of exactly one type and fully reacting the result?
+    Appends already reacted polymer to the already reacted remaining units
+    (bytearray), reacting only the units at the boundary between them.
+    '''
+    index = 0
+    while (remaining_units and index < len(polymer) and
+           remaining_units[-1] ^ polymer[index] == 32):
+        remaining_units.pop()
+        index += 1
 
-    For each reagent (letter) in reagents (lowercase alphabet) removes units of
-    this reagent (lower and upper cases of that letter), performs a reaction
-    and adds length of that reaction to a list. Finally, the result is the
-    length of the shortest polymer (minimum length in list).
+    remaining_units += polymer[index:]
+    return remaining_units
+
+
+def split_polymer(polymer, chunk_size=CHUNK_SIZE, length=None):
+    '''Generator that yields consecutive parts of the first length units of polymer.'''
+    if length is None:
+        length = len(polymer)
+
+    for start in range(0, length, chunk_size):
+        yield polymer[start:min(start + chunk_size, length)]
+
+
+def react_chunks(chunks, workers=None):
     '''
+    Reacts consecutive parts of a polymer in a process pool and merges them,
+    returns remaining units as bytes.
 
-    def can_react(unit1, unit2):
-        '''
-        Returns True if given units are same type and have opposite polarities.
+    Reaction doesn't depend on how polymer is split, i.e. reacting a polymer is
+    the same as reacting reacted parts of it, so parts can be reacted
+    independently. Only a few parts per worker are submitted at a time, so
+    chunks can be read lazily.
+    '''
+    remaining_units = bytearray()
 
-        >>>can_react('a', 'A')
-        True
-        >>>can_react('a', 'B')
-        False
-        '''
+    with ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        window = 2 * (workers or os.cpu_count() or 1)
 
-        def same_type(unit1, unit2):
-            '''
-            Returns True if given units are same type.
+        for chunk in chunks:
+            pending.append(executor.submit(react, chunk))
+            if len(pending) >= window:
+                merge_reacted(remaining_units, pending.popleft().result())
 
-            >>>same_type('e', 'E')
-            True
-            >>>same_type('e', 'c')
-            False
-            '''
+        while pending:
+            merge_reacted(remaining_units, pending.popleft().result())
 
-            return unit1.lower() == unit2.lower()
+    return bytes(remaining_units)
 
-        def opposite_polarity(unit1, unit2):
-            '''
-            Returns True if given units are same type.
 
-            >>>opposite_polarity('e', 'E')
-            True
-            >>>opposite_polarity('e', 'e')
-            False
-            '''
+def react_parallel(polymer, workers=None, chunk_size=CHUNK_SIZE):
+    '''Reacts the polymer split into parts in a process pool, returns remaining units.'''
+    return react_chunks(split_polymer(polymer, chunk_size), workers)
 
-            return ((unit1.isupper() and unit2.islower()) or
-                    (unit1.islower() and unit2.isupper()))
 
-        return (same_type(unit1, unit2) and
-                opposite_polarity(unit1, unit2))
+def react_file(path, workers=None, chunk_size=CHUNK_SIZE):
+    '''
+    Reacts the polymer from file in a process pool, returns remaining units.
+    File is memory mapped, so parts of it are read only when they are sent
+    to workers.
+    '''
+    with open(path, 'rb') as polymer_file:
+        if os.fstat(polymer_file.fileno()).st_size == 0:
+            return b''
 
-    def do_reaction(polymer):
-        '''
-        Reacts the polymer, returns remaining units.
+        with mmap.mmap(polymer_file.fileno(), 0, access=mmap.ACCESS_READ) as polymer:
+            # Skips trailing whitespace, e.g. newline at the end of file
+            length = len(polymer)
+            while length and polymer[length - 1] in WHITESPACE:
+                length -= 1
 
-        dabAcCaCBAcCcaDA  The first 'cC' is removed.
-        dabAaCBAcCcaDA    This creates 'Aa', which is removed.
-        dabCBAcCcaDA      Either 'cC' or 'Cc' are removed.
-        dabCBAcaDA        No further actions can be taken.
-        '''
+            chunks = split_polymer(polymer, chunk_size, length)
+            return react_chunks(chunks, workers)
 
-        remaining_units = []
 
-        for unit in polymer:
-            if remaining_units and can_react(unit, remaining_units[-1]):
-                remaining_units.pop()
-            else:
-                remaining_units.append(unit)
+def part_one(polymer, workers=1):
+    '''
+    Question:
+        How many units remain after fully reacting the polymer you scanned?
+
+    Performs a reaction on the polymer, gets the remaining units.
+    Result is the length of them. With more than one worker (None for the
+    number of CPUs) polymer is reacted in parts in parallel.
+    '''
+
+    # Performs a reaction and gets the remaining units
+    if workers == 1:
+        units = react(polymer)
+    else:
+        units = react_parallel(polymer, workers)
+    # Returns how many units remaining
+    return len(units)
 
-        return remaining_units
 
-    def remove_units(polymer, unit):
-        '''Removes all units of one type from polymer and returns it.'''
-        edited_polymer = polymer.replace(unit, '').replace(unit.upper(), '')
-        return edited_polymer
+def react_without(polymer, reagent):
+    '''
+    Removes all units of one type (lower and upper cases of the reagent)
+    from polymer, reacts the result and returns its length.
+    '''
+    edited_polymer = polymer.translate(None, (reagent + reagent.upper()).encode())
+    return len(react(edited_polymer))
 
-    # Set of reagents (alphabet in lowercase)
-    reagents = set([c for c in ascii_lowercase])
 
-    polymers_length = []
-    # Removes all units of exactly one type and fully reacts the result and
-    # adds its length to polymers_length list
-    for reagent in reagents:
-        edited_polymer = remove_units(polymer, reagent)
-        reacted_polymer = do_reaction(edited_polymer)
-        polymers_length.append(len(reacted_polymer))
+def reagent_lengths(polymer, workers=1):
+    '''
+    Returns dict with length of the fully reacted polymer after removing each
+    reagent (letter of the lowercase alphabet).
+
+    Removing units and reacting the result gives the same as removing units
+    from the reacted polymer and reacting it again, so reagents are removed
+    from the much shorter reacted polymer. With more than one worker (None for
+    the number of CPUs) reagents are tried in parallel.
+    '''
+    reacted_polymer = react(polymer)
+    reagents = list(ascii_lowercase)
+    polymers = itertools.repeat(reacted_polymer, len(reagents))
+
+    if workers == 1:
+        lengths = map(react_without, polymers, reagents)
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            lengths = list(executor.map(react_without, polymers, reagents))
+
+    return dict(zip(reagents, lengths))
+
+
+def part_two(polymer, workers=1):
+    '''
+    Question:
+        What is the length of the shortest polymer you can produce by removing
+        all units of exactly one type and fully reacting the result?
+
+    For each reagent (letter) in reagents (lowercase alphabet) removes units of
+    this reagent (lower and upper cases of that letter) from the reacted
+    polymer and reacts it again. Finally, the result is the length of the
+    shortest polymer.
+    '''
+    polymers_length = reagent_lengths(polymer, workers)
 
     # Gets length of the shortest polymer
-    shortest_polymer_length = min(polymers_length)
+    shortest_polymer_length = min(polymers_length.values())
     return shortest_polymer_length
 
 
 def main():
 
     input_file = pathlib.Path(__file__).resolve().parent / 'input.txt'
-    polymer = input_file.read_text().strip()
+
+    # Reacted polymer gives the same answers, so it is reacted while reading
+    reducer = PolymerReducer()
+    for chunk in read_chunks(input_file):
+        reducer.feed(chunk)
+    polymer = reducer.snapshot()
 
     print(f'Part One: {part_one(polymer)}')
     print(f'Part Two: {part_two(polymer)}')
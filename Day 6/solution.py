@@ -1,7 +1,74 @@
 """Solution to Advent of Code 2018, Day 6: Chronal Coordinates (https://adventofcode.com/2018/day/6)."""
+import bisect
 import operator
+import os
 import pathlib
-from collections import defaultdict
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Labels of grid points that aren't nearest to exactly one coordinate
+TIE = -1
+UNVISITED = -2
+
+
+def label_grid(coordinates, max_x, max_y):
+    '''
+    Labels each point of the grid from (0, 0) to (max_x, max_y) with index of
+    the coordinate that has the minimum manhattan distance to it, or TIE if
+    there are two or more such coordinates. Returns labels as a flat array,
+    where point (x, y) has index y * (max_x + 1) + x.
+
+    On a grid without obstacles breadth-first distance is manhattan distance,
+    so a breadth-first search started from all coordinates at once reaches
+    every point first from its nearest coordinates. Point reached in the same
+    step from different labels (or from a tie) is a tie.
+    '''
+    width = max_x + 1
+    size = width * (max_y + 1)
+
+    labels = array('i', [UNVISITED]) * size
+    distances = array('i', [0]) * size
+
+    frontier = []
+    for index, (x, y) in enumerate(coordinates):
+        point = y * width + x
+        if labels[point] == UNVISITED:
+            labels[point] = index
+            frontier.append(point)
+        else:
+            labels[point] = TIE
+
+    while frontier:
+        next_frontier = []
+
+        for point in frontier:
+            label = labels[point]
+            distance = distances[point] + 1
+            x = point % width
+
+            neighbours = []
+            if x > 0:
+                neighbours.append(point - 1)
+            if x < max_x:
+                neighbours.append(point + 1)
+            if point >= width:
+                neighbours.append(point - width)
+            if point + width < size:
+                neighbours.append(point + width)
+
+            for neighbour in neighbours:
+                if labels[neighbour] == UNVISITED:
+                    labels[neighbour] = label
+                    distances[neighbour] = distance
+                    next_frontier.append(neighbour)
+                elif distances[neighbour] == distance and labels[neighbour] != label:
+                    labels[neighbour] = TIE
+
+        frontier = next_frontier
+
+    return labels
 
 
 def part_one(coordinates):
@@ -9,75 +76,42 @@ def part_one(coordinates):
     Question:
         What is the size of the largest area that isn't infinite?
 
-    Iterates over each point in the grid (for each x and y in the range of
-    maximum x and maximum y). Finds all manhattan distances between the current
-    point and all coordinates. Value of the coordinate with the minimum
-    manhattan distance in areas dict is increased by 1, and if the current
-    point is extreme, then the coordinate is added to the infinite_coords set.
-    Finds the largest area from all areas.
+    Labels each point in the grid (for each x and y in the range of maximum x
+    and maximum y) with the coordinate that has the minimum manhattan
+    distance to it. The size of an area is the number of points labeled with
+    its coordinate, and if any of them is extreme, then the coordinate is
+    added to the infinite_coords set. Finds the largest area from all areas.
     '''
 
-    def calculate_manhattan_distance(p, q):
-        '''Calculates manhattan distance between 2 points and returns it.'''
-        distance = abs(p[0] - q[0]) + abs(p[1] - q[1])
-        return distance
-
-    def find_all_distances(point):
+    def extreme_points():
         '''
-        Finds all manhattan distances between a given point and coordinates.
+        Generator that yields all extreme points, i.e. points whose x or y
+        equals 0, or x equals maximum x, or y equals maximum y.
         '''
-        distances = []
-        for coordinate in coordinates:
-            distance = calculate_manhattan_distance(current_point, coordinate)
-            distances.append((distance, coordinate))
-        return distances
-
-    def is_extreme(point):
-        '''
-        Returns True if given point is extreme, i.e. its x or y equals 0,
-        or x equals maximum x, or y equals maximum y.
-        '''
-        if not isinstance(point, tuple):
-            return False
-
-        p_x = point[0]
-        p_y = point[1]
-        return not all((p_x, p_y)) or p_x == max_x or p_y == max_y
+        for x in range(max_x + 1):
+            yield (x, 0)
+            yield (x, max_y)
+        for y in range(max_y + 1):
+            yield (0, y)
+            yield (max_x, y)
 
     max_x = max(coordinates, key=operator.itemgetter(0))[0]
     max_y = max(coordinates, key=operator.itemgetter(1))[1]
 
-    # Dictionary containing the coordinate as a key and the number of points
-    # that have the minimum manhattan distance to this coordinate as a value
-    areas = defaultdict(int)
+    labels = label_grid(coordinates, max_x, max_y)
+
+    # Dictionary containing the index of the coordinate as a key and the number
+    # of points that have the minimum manhattan distance to this coordinate as
+    # a value
+    areas = Counter(labels)
+    del areas[TIE]
 
     # A set containing coordinates that have at least one minimum manhattan
     # distance with a point that is on the edge of grid, i.e. infinite
     # coordinates
     infinite_coords = set()
-
-    for x in range(max_x + 1):
-        for y in range(max_y + 1):
-            current_point = (x, y)
-
-            # List containing tuples with a distance, between current point
-            # and coordinate, and the coordinate itself
-            distances = find_all_distances(current_point)
-            distances.sort()
-
-            # If there are no equal distances, i.e. point is not equally far
-            # from two or more coordinates
-            if distances[0][0] != distances[1][0]:
-                # Coordinate that has the minimum manhattan distance to the
-                # current point
-                min_coordinate = distances[0][1]
-                areas[min_coordinate] += 1
-
-                # If current point is extreme, then the coordinate to which it
-                # has the minimum manhattan distance is infinite, so we add
-                # this coordinate to the infinite_coords set
-                if is_extreme(current_point):
-                    infinite_coords.add(min_coordinate)
+    for x, y in extreme_points():
+        infinite_coords.add(labels[y * (max_x + 1) + x])
 
     # Finds the largest area
     largest_area = max(area for coord, area in areas.items()
@@ -85,46 +119,214 @@ def part_one(coordinates):
     return largest_area
 
 
-def part_two(coordinates):
+def axis_distance_sums(values, low, high):
+    '''
+    Returns list with sums of distances from each position in range from low
+    to high to all values on one axis.
+
+    Moving one position to the right increases the distance to every value
+    at or to the left of the position by 1 and decreases it to every value to
+    the right of it by 1, so the sums are found incrementally.
+
+    Example:
+        print(axis_distance_sums([1, 3], 0, 4))
+        [4, 2, 2, 2, 4]
+    '''
+    values = sorted(values)
+    sums = []
+
+    current_sum = sum(abs(value - low) for value in values)
+    at_or_left = bisect.bisect_right(values, low)
+
+    for position in range(low, high + 1):
+        sums.append(current_sum)
+        while at_or_left < len(values) and values[at_or_left] <= position:
+            at_or_left += 1
+        current_sum += at_or_left - (len(values) - at_or_left)
+
+    return sums
+
+
+def region_bounds(values, limit):
+    '''
+    Returns the lowest and the highest position on one axis where a location
+    can have a total distance to all coordinates of less than limit. Every
+    position farther than limit / len(values) from all values is too far.
+    '''
+    margin = limit // len(values) + 1
+    return min(values) - margin, max(values) + margin
+
+
+def region_size(coordinates, limit):
+    '''
+    Returns the size of the region containing all locations which have a
+    total distance to all coordinates of less than limit.
+
+    Total manhattan distance is the sum of distances along x and along y, so
+    they are calculated separately for each column and row. Every location
+    farther than limit / len(coordinates) from all coordinates along an axis
+    is too far, which bounds the region (see region_bounds()). Then for each column (from the
+    closest) the rows that fit are counted with a pointer that only moves
+    down.
+    '''
+    xs = [x for x, _ in coordinates]
+    ys = [y for _, y in coordinates]
+
+    x_sums = sorted(axis_distance_sums(xs, *region_bounds(xs, limit)))
+    y_sums = sorted(axis_distance_sums(ys, *region_bounds(ys, limit)))
+
+    size = 0
+    # Number of rows with total distance less than limit for the current column
+    rows = len(y_sums)
+    for x_sum in x_sums:
+        while rows and x_sum + y_sums[rows - 1] >= limit:
+            rows -= 1
+        size += rows
+
+    return size
+
+
+def part_two(coordinates, limit=10000):
     '''
     Question:
         What is the size of the region containing all locations which have a total distance to all given coordinates of less than 10000?
 
-    Iterates over each point in the grid (for each x and y in the range of
-    maximum x and maximum y). Finds all manhattan distances between the current
-    point and all coordinates. If the sum of these distances is less that
-    10,000 then add 1 to the size of the shared region.
+    Calculates sums of distances to all coordinates along x and y axes
+    separately, then counts locations whose total distance is less than the
+    limit, including those outside of the coordinates.
     '''
+    return region_size(coordinates, limit)
 
-    def calculate_manhattan_distance(p, q):
-        '''Calculates manhattan distance between 2 points and returns it.'''
-        distance = abs(p[0] - q[0]) + abs(p[1] - q[1])
-        return distance
 
-    def find_all_distances(point):
-        '''
-        Finds all manhattan distances between a given point and coordinates.
-        '''
-        distances = []
-        for coordinate in coordinates:
-            distance = calculate_manhattan_distance(current_point, coordinate)
-            distances.append(distance)
-        return distances
+# Coordinates and everything derived from them that row bands need, set
+# once per worker process by init_band_worker()
+band_context = {}
 
-    manhattan_distance_limit = 10000
-    max_x = max(coordinates, key=operator.itemgetter(0))[0]
-    max_y = max(coordinates, key=operator.itemgetter(1))[1]
+
+def init_band_worker(coordinates, limit):
+    '''Shares coordinates and limit with evaluate_band() in a worker process.'''
+    xs = [x for x, _ in coordinates]
+
+    band_context['coordinates'] = coordinates
+    band_context['limit'] = limit
+    band_context['max_x'] = max(xs)
+    band_context['max_y'] = max(y for _, y in coordinates)
+    band_context['x_sums'] = sorted(
+        axis_distance_sums(xs, *region_bounds(xs, limit)))
+
+
+def label_row(coordinates, y_distances, max_x):
+    '''
+    Labels each point of a row from x = 0 to max_x with index of the nearest
+    coordinate, or TIE, given distances from the row to each coordinate.
+
+    Every coordinate starts at its own column with its distance to the row,
+    then sweeps from left to right and from right to left carry the nearest
+    coordinate one column further, one more step away. Candidates from
+    different sides (or from a column and its neighbour) are different
+    coordinates, so equal distances are a tie.
+    '''
+    distances = [None] * (max_x + 1)
+    labels = [UNVISITED] * (max_x + 1)
+
+    for index, (c_x, _) in enumerate(coordinates):
+        distance = y_distances[index]
+        if distances[c_x] is None or distance < distances[c_x]:
+            distances[c_x] = distance
+            labels[c_x] = index
+        elif distance == distances[c_x]:
+            labels[c_x] = TIE
+
+    for columns, step in ((range(1, max_x + 1), -1), (range(max_x - 1, -1, -1), 1)):
+        for x in columns:
+            previous = distances[x + step]
+            if previous is None:
+                continue
+            distance = previous + 1
+            if distances[x] is None or distance < distances[x]:
+                distances[x] = distance
+                labels[x] = labels[x + step]
+            elif distance == distances[x]:
+                labels[x] = TIE
+
+    return labels
+
+
+def evaluate_band(rows):
+    '''
+    Evaluates rows from rows[0] until rows[1] of the grid. Returns a tuple
+    with area of each coordinate (index of coordinate: number of points),
+    set of coordinates nearest to extreme points, and number of locations
+    with a total distance to all coordinates of less than limit.
+
+    Areas are counted only in the grid from (0, 0) to (max x, max y), each
+    row labeled in O(W + N) with label_row(), while locations of the region
+    are counted in every row, across all columns where the region can be.
+    '''
+    coordinates = band_context['coordinates']
+    limit = band_context['limit']
+    max_x = band_context['max_x']
+    max_y = band_context['max_y']
+    x_sums = band_context['x_sums']
+
+    areas = Counter()
+    extreme_labels = set()
     shared_region_size = 0
 
-    for x in range(max_x + 1):
-        for y in range(max_y + 1):
-            current_point = (x, y)
-            distances = find_all_distances(current_point)
+    for y in range(*rows):
+        y_distances = [abs(y - c_y) for _, c_y in coordinates]
+
+        # Columns where total distance is less than limit in this row
+        shared_region_size += bisect.bisect_left(x_sums, limit - sum(y_distances))
+
+        if not 0 <= y <= max_y:
+            continue
+
+        labels = label_row(coordinates, y_distances, max_x)
+        areas.update(labels)
+        extreme_labels.add(labels[0])
+        extreme_labels.add(labels[max_x])
+        if y in (0, max_y):
+            extreme_labels.update(labels)
+
+    del areas[TIE]
+    extreme_labels.discard(TIE)
+    return areas, extreme_labels, shared_region_size
+
 
-            if sum(distances) < manhattan_distance_limit:
-                shared_region_size += 1
+def evaluate_grid(coordinates, limit=10000, workers=None, bands=None):
+    '''
+    Returns the size of the largest area that isn't infinite and the size of
+    the region with a total distance less than limit, evaluating the grid in
+    row bands in a process pool of workers (None for the number of CPUs).
+    '''
+    ys = [y for _, y in coordinates]
+
+    # Rows of the region, and of the grid from y = 0 to maximum y for areas
+    low_y, high_y = region_bounds(ys, limit)
+    low_y = min(low_y, 0)
+    high_y = max(high_y, max(ys)) + 1
+
+    if bands is None:
+        bands = 4 * (workers or os.cpu_count() or 1)
+    band_height = -(-(high_y - low_y) // bands)
+    rows = [(start, min(start + band_height, high_y))
+            for start in range(low_y, high_y, band_height)]
+
+    areas = Counter()
+    infinite_coords = set()
+    shared_region_size = 0
+
+    with ProcessPoolExecutor(workers, initializer=init_band_worker,
+                             initargs=(coordinates, limit)) as executor:
+        for band_areas, extreme_labels, band_region_size in executor.map(evaluate_band, rows):
+            areas.update(band_areas)
+            infinite_coords.update(extreme_labels)
+            shared_region_size += band_region_size
 
-    return shared_region_size
+    largest_area = max(area for coord, area in areas.items()
+                       if coord not in infinite_coords)
+    return largest_area, shared_region_size
 
 
 def main():
@@ -1,5 +1,79 @@
 """Solution to Advent of Code 2018, Day 7: The Sum of Its Parts (https://adventofcode.com/2018/day/7."""
+import collections
+import heapq
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Graph():
+    '''
+    Class representing steps and their dependencies: for each step the
+    list of steps that follow it and the number of steps that precede it.
+    Step names can be any words, not only single letters.
+    '''
+
+    def __init__(self, instructions=()):
+
+        self.successors = {}
+        self.indegrees = {}
+
+        for instruction in instructions:
+            # "Step P must be finished before step F can begin." -> P, F
+            words = instruction.split()
+            self.add_dependency(words[1], words[-3])
+
+    def add_step(self, step):
+        '''Adds step without dependencies, if it isn't added yet.'''
+        if step not in self.successors:
+            self.successors[step] = []
+            self.indegrees[step] = 0
+
+    def add_dependency(self, predecessor, successor):
+        '''Adds dependency: predecessor must be finished before successor can begin.'''
+        self.add_step(predecessor)
+        self.add_step(successor)
+        self.successors[predecessor].append(successor)
+        self.indegrees[successor] += 1
+
+    def available_steps(self):
+        '''Returns steps that have no predecessors.'''
+        return [step for step, indegree in self.indegrees.items() if indegree == 0]
+
+
+def topological_order(graph):
+    '''
+    Returns list of all steps in order they should be completed, where of the
+    available steps the alphabetically first one is completed first.
+
+    Available steps are kept in a heap. When a step is completed, number of
+    remaining predecessors of each of its successors is decreased, and steps
+    that have no remaining predecessors become available.
+
+    Example:
+        graph = Graph(['Step C must be finished before step A can begin.',
+                       'Step C must be finished before step F can begin.',
+                       'Step A must be finished before step B can begin.'])
+        print(topological_order(graph))
+        ['C', 'A', 'B', 'F']
+    '''
+    indegrees = dict(graph.indegrees)
+    available = graph.available_steps()
+    heapq.heapify(available)
+
+    order = []
+    while available:
+        step = heapq.heappop(available)
+        order.append(step)
+
+        for successor in graph.successors[step]:
+            indegrees[successor] -= 1
+            if indegrees[successor] == 0:
+                heapq.heappush(available, successor)
+
+    if len(order) != len(indegrees):
+        raise ValueError('Steps have circular dependencies')
+
+    return order
 
 
 def part_one(instructions):
@@ -7,147 +81,181 @@ def part_one(instructions):
     Question:
         In what order should the steps in your instructions be completed?
 
-    Gets the next available steps in the list as long as set of steps is full.
-    The first element of this list is the next step, add it to the resulting order, remove it from set of steps.
+    Builds a graph of steps and orders them topologically, always completing
+    the alphabetically first available step.
     '''
+    graph = Graph(instructions)
+    order = ''.join(topological_order(graph))
+    return order
 
-    def get_next_steps(steps, sequence):
-        '''
-        Gets the current steps in the set and their sequence in the list.
-        Returns next available steps.
-        '''
-        next_steps = []
-        for step in steps:
-            if all(successor != step for (_, successor) in sequence):
-                next_steps.append(step)
-        return next_steps
 
-    # Set containing all steps
-    steps = set()
+def step_duration(step, base_duration=60):
+    '''
+    Returns duration of the step named by a letter: base duration plus its
+    number in the alphabet (A=1, B=2, ...).
 
-    # List containing the preceding step and the following, e.g.
-    # "Step P must be finished before step F can begin." -> [(P, F), ...]
-    predecessor_successor = []
+    >>>step_duration('C')
+    63
+    '''
+    if len(step) != 1 or not 'A' <= step <= 'Z':
+        raise ValueError(f'No default duration for step {step!r}, give durations')
+    return base_duration + ord(step) - ord('A') + 1
 
-    for instruction in instructions:
-        words = instruction.split()
-        predecessor = words[1]
-        successor = words[-3]
-        predecessor_successor.append((predecessor, successor))
-        steps.update(predecessor, successor)
 
-    order = ''
-    while steps:
-        # Gets next available steps in the list, sorts it
-        next_steps = get_next_steps(steps, predecessor_successor)
-        next_steps.sort()
+def schedule(graph, workers=5, base_duration=60, durations=None):
+    '''
+    Simulates workers completing steps and returns dict with start and finish
+    time of each step. Durations of steps can be given in durations dict,
+    otherwise they depend on letters of steps (see step_duration()).
 
-        # The first element of this list is the next step
-        step = next_steps[0]
-        order += step
+    Instead of counting every second, steps in progress are kept in a heap
+    by finish time, and time jumps straight to the next finish. Then
+    available steps (alphabetically first first) are given to idle workers.
+    '''
+    if workers < 1:
+        raise ValueError('workers must be at least 1')
 
-        # Since this step is completed, we delete it from the set of all steps
-        steps.remove(step)
+    if durations is None:
+        durations = {}
 
-        # Update our predecessor_successor list
-        predecessor_successor = [(p, s) for (p, s)
-                                 in predecessor_successor if p != step]
+    indegrees = dict(graph.indegrees)
+    available = graph.available_steps()
+    heapq.heapify(available)
 
-    return order
+    # Heap containing finish time and step of steps in progress
+    in_progress = []
+    idle_workers = workers
+    times = {}
+    time = 0
 
+    while available or in_progress:
+        # Gives available steps to idle workers
+        while available and idle_workers:
+            step = heapq.heappop(available)
+            duration = durations.get(step)
+            if duration is None:
+                duration = step_duration(step, base_duration)
+            times[step] = (time, time + duration)
+            heapq.heappush(in_progress, (time + duration, step))
+            idle_workers -= 1
 
-def part_two(instructions):
-    '''
-    Question:
-        With 5 workers and the 60+ second step durations described above, how
-        long will it take to complete all of the steps?
+        # Jumps to the next finish and completes all steps finished by then
+        time = in_progress[0][0]
+        while in_progress and in_progress[0][0] == time:
+            _, step = heapq.heappop(in_progress)
+            idle_workers += 1
+            for successor in graph.successors[step]:
+                indegrees[successor] -= 1
+                if indegrees[successor] == 0:
+                    heapq.heappush(available, successor)
+
+    if len(times) != len(indegrees):
+        raise ValueError('Steps have circular dependencies')
+
+    return times
+
+
+def all_durations(graph, base_duration=60, durations=None):
+    '''Returns dict with duration of every step, given or letter-based.'''
+    if durations is None:
+        durations = {}
+
+    return {step: durations[step] if step in durations
+            else step_duration(step, base_duration)
+            for step in graph.indegrees}
 
-    Creates 5 workers. While set of the all steps is full, or any of the
-    workers have a job, we iterate over our workers, check if they have a job,
-    if not, then add it.
+
+def critical_path(graph, durations):
+    '''
+    Returns the longest chain of dependent steps by total duration and its
+    total duration. No number of workers can complete all steps faster.
     '''
+    # Earliest start and finish time of each step, and the step on the
+    # longest chain leading to it
+    starts = {}
+    finishes = {}
+    previous = {}
 
-    class Worker:
-        '''Worker class representing elf worker.'''
+    for step in topological_order(graph):
+        finish = starts.get(step, 0) + durations[step]
+        finishes[step] = finish
 
-        def __init__(self):
+        for successor in graph.successors[step]:
+            if finish > starts.get(successor, 0):
+                starts[successor] = finish
+                previous[successor] = step
 
-            self.job = None
-            self.remaining_time = 0
+    if not finishes:
+        return [], 0
 
-        def add_work(self, letter):
-            '''Adds work and time for it accordingly.'''
-            self.job = letter
-            self.remaining_time = 60 + ord(letter) - ord('A')
+    step = max(finishes, key=finishes.get)
+    length = finishes[step]
+    path = [step]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    path.reverse()
 
-        def do_work(self):
-            '''Perfoms work by reducing the remaining time by 1 second.'''
-            if self.job and self.remaining_time:
-                self.remaining_time -= 1
+    return path, length
 
-    def get_next_steps(steps, sequence):
-        '''
-        Gets the current steps in the set and their sequence in the list.
-        Returns next available steps.
-        '''
-        next_steps = []
-        for step in steps:
-            if all(successor != step for (_, successor) in sequence):
-                next_steps.append(step)
-        return next_steps
 
-    # Set containing all steps
-    steps = set()
+# Result of analyse(): critical path, its duration, and dict with finish
+# time of the last step and times of each step for each number of workers
+Analysis = collections.namedtuple('Analysis', ['critical_path', 'lower_bound', 'curve'])
 
-    # List containing the preceding step and the following, e.g.
-    # "Step P must be finished before step F can begin." -> [(P, F), ...]
-    predecessor_successor = []
 
-    for instruction in instructions:
-        words = instruction.split()
-        predecessor = words[1]
-        successor = words[-3]
-        predecessor_successor.append((predecessor, successor))
-        steps.update(predecessor, successor)
+# Graph and durations of steps that schedule_workers() needs, set once per
+# worker process by init_schedule_worker()
+schedule_context = {}
+
+
+def init_schedule_worker(graph, durations):
+    '''Shares graph and durations with schedule_workers() in a worker process.'''
+    schedule_context['graph'] = graph
+    schedule_context['durations'] = durations
+
+
+def schedule_workers(workers):
+    '''Schedules the shared graph for the number of workers, returns times of steps.'''
+    return schedule(schedule_context['graph'], workers,
+                    durations=schedule_context['durations'])
 
-    # Resulting time
-    time = 0
 
-    # Initializes workers and adds them to the list
-    workers = [Worker() for _ in range(5)]
-
-    # While set of the steps is full, or any of the workers have a job...
-    while steps or any(worker.remaining_time > 0 for worker in workers):
-        # Gets next available steps in the list, sorts it
-        next_steps = get_next_steps(steps, predecessor_successor)
-        next_steps.sort()
-
-        # Iterates over workers
-        for worker in workers:
-            worker.do_work()
-
-            # If worker job is completed...
-            if worker.remaining_time == 0:
-                if worker.job:
-                    # Updates our predecessor_successor list if worker have job
-                    predecessor_successor = [(p, s) for (p, s) in
-                                             predecessor_successor
-                                             if p != worker.job]
-                if next_steps:
-                    # Gets next step
-                    step = next_steps.pop()
-
-                    # Adds work to the current worker
-                    worker.add_work(step)
-
-                    # Removes this step from the set of all steps
-                    steps.remove(step)
-
-        # Since there is no need for time between steps, we simply add 1
-        # second to the total time
-        time += 1
-
-    return time
+def analyse(instructions, max_workers, base_duration=60, durations=None, processes=None):
+    '''
+    Parses instructions once and schedules steps for every number of workers
+    from 1 to max_workers in a process pool (None for the number of CPUs).
+    Graph and durations are sent to each process once, only worker counts are
+    sent per schedule.
+    '''
+    graph = Graph(instructions)
+    durations = all_durations(graph, base_duration, durations)
+    path, lower_bound = critical_path(graph, durations)
+
+    worker_counts = range(1, max_workers + 1)
+    with ProcessPoolExecutor(processes, initializer=init_schedule_worker,
+                             initargs=(graph, durations)) as executor:
+        all_times = executor.map(schedule_workers, worker_counts)
+
+        curve = {}
+        for workers, times in zip(worker_counts, all_times):
+            makespan = max((finish for _, finish in times.values()), default=0)
+            curve[workers] = (makespan, times)
+
+    return Analysis(path, lower_bound, curve)
+
+
+def part_two(instructions, workers=5, base_duration=60, durations=None):
+    '''
+    Question:
+        With 5 workers and the 60+ second step durations described above, how
+        long will it take to complete all of the steps?
+
+    Simulates workers completing steps, jumping from one finish to the next.
+    Result is the finish time of the last step.
+    '''
+    graph = Graph(instructions)
+    times = schedule(graph, workers, base_duration, durations)
+    return max((finish for _, finish in times.values()), default=0)
 
 
 def main():
@@ -1,53 +1,203 @@
 """Solution to Advent of Code 2018, Day 8: Memory Maneuver (https://adventofcode.com/2018/day/8."""
 import pathlib
+from array import array
 
 
-def part_one(numbers):
+def parse_tree(numbers):
     '''
-    Question:
-        What is the sum of all metadata entries?
-
-    Creates a master node that recursively creates all other nodes. Sums all
-    metadata entries recursively.
+    Walks the tree in a single pass and returns the sum of all metadata
+    entries and the value of the root node.
+
+    Instead of recursion, nodes whose children are being read are kept on a
+    stack as [remaining children, metadata count, values of children], and an
+    index moves through numbers without copying them. When all children of a
+    node are read, its metadata follows, so its value is known and added to
+    the values of its parent's children.
+
+    Example:
+        numbers = [2, 3, 0, 3, 10, 11, 12, 1, 1, 0, 1, 99, 2, 1, 1, 2]
+        print(parse_tree(numbers))
+        (138, 66)
+    '''
+    metadata_sum = 0
+    index = 0
+    stack = []
+
+    while True:
+        if not stack or stack[-1][0] > 0:
+            # Reads header of the next node
+            if stack:
+                stack[-1][0] -= 1
+            child_count = numbers[index]
+            metadata_count = numbers[index + 1]
+            index += 2
+            stack.append([child_count, metadata_count, []])
+            continue
+
+        # All children are read, reads metadata
+        _, metadata_count, children_values = stack.pop()
+        value = 0
+        for position in range(index, index + metadata_count):
+            entry = numbers[position]
+            metadata_sum += entry
+            if not children_values:
+                value += entry
+            elif 0 < entry <= len(children_values):
+                value += children_values[entry - 1]
+        index += metadata_count
+
+        if not stack:
+            return metadata_sum, value
+        stack[-1][2].append(value)
+
+
+class ArrayTree():
+    '''
+    Class representing the tree as parallel arrays with one entry per node
+    (nodes are numbered in order of their headers, the root is 0), instead
+    of an object per node. Metadata isn't copied, nodes point to it in the
+    numbers of the licence file.
+
+    Columns:
+        child_counts: number of children of the node
+        metadata_offsets: index of the first metadata entry in numbers
+        metadata_counts: number of metadata entries
+        first_children: first child of the node, or -1
+        next_siblings: next child of the node's parent, or -1
     '''
 
-    class Node():
-        '''Class representing a node of the tree.'''
-
-        def __init__(self, sequence):
+    COLUMNS = ['child_counts', 'metadata_offsets', 'metadata_counts',
+               'first_children', 'next_siblings']
+
+    def __init__(self, numbers):
+
+        self.numbers = array('i', numbers)
+        # Values of all nodes, evaluated when a value is first needed
+        self.values = None
+        for column in self.COLUMNS:
+            setattr(self, column, array('i'))
+
+        if self.numbers:
+            self.build()
+
+    def build(self):
+        '''
+        Fills columns walking through numbers with an explicit stack of
+        [node, remaining children, last read child].
+        '''
+        index = 0
+        stack = []
+
+        while True:
+            if not stack or stack[-1][1] > 0:
+                # Reads header of the next node
+                node = len(self.child_counts)
+                self.child_counts.append(self.numbers[index])
+                self.metadata_counts.append(self.numbers[index + 1])
+                self.metadata_offsets.append(-1)
+                self.first_children.append(-1)
+                self.next_siblings.append(-1)
+                index += 2
+
+                if stack:
+                    parent = stack[-1]
+                    parent[1] -= 1
+                    if parent[2] == -1:
+                        self.first_children[parent[0]] = node
+                    else:
+                        self.next_siblings[parent[2]] = node
+                    parent[2] = node
+
+                stack.append([node, self.child_counts[node], -1])
+                continue
+
+            # All children are read, metadata follows
+            node, _, _ = stack.pop()
+            self.metadata_offsets[node] = index
+            index += self.metadata_counts[node]
+
+            if not stack:
+                return
+
+    def children(self, node):
+        '''Returns list of children of the node.'''
+        children = []
+        child = self.first_children[node]
+        while child != -1:
+            children.append(child)
+            child = self.next_siblings[child]
+        return children
+
+    def metadata(self, node):
+        '''Returns metadata entries of the node.'''
+        offset = self.metadata_offsets[node]
+        return self.numbers[offset:offset + self.metadata_counts[node]]
+
+    def sum(self):
+        '''Sums all metadata entries and returns it.'''
+        return sum(sum(self.metadata(node)) for node in range(len(self.child_counts)))
+
+    def evaluate(self):
+        '''
+        Calculates values of all nodes, returns them as a list (values can
+        outgrow fixed-size integers, since they multiply with depth). A node is
+        numbered after its parent, so going from the last node to the first,
+        values of children are always known before the value of their
+        parent. Each node is evaluated once, no matter how many times its
+        parent's metadata refers to it.
+        '''
+        values = [0] * len(self.child_counts)
+
+        for node in reversed(range(len(self.child_counts))):
+            children = self.children(node)
+            if children:
+                values[node] = sum(values[children[entry - 1]]
+                                   for entry in self.metadata(node)
+                                   if 0 < entry <= len(children))
+            else:
+                values[node] = sum(self.metadata(node))
 
-            self.child_count = sequence[0]
-            self.metadata_count = sequence[1]
-            sequence = sequence[2:]
-            self.childrens = []
+        return values
 
-            # Creates children's nodes and adds them to the list
-            for _ in range(self.child_count):
-                child_node = Node(sequence)
-                self.childrens.append(child_node)
-                sequence = sequence[child_node.get_size():]
+    def value(self, node=0):
+        '''Returns the value of a node, evaluating all nodes on the first call.'''
+        if self.values is None:
+            self.values = self.evaluate()
+        return self.values[node]
 
-            self.metadata = sequence[:self.metadata_count]
+    def save(self, path):
+        '''Writes the tree to a binary file.'''
+        with open(path, 'wb') as tree_file:
+            sizes = array('q', [len(self.numbers), len(self.child_counts)])
+            sizes.tofile(tree_file)
+            self.numbers.tofile(tree_file)
+            for column in self.COLUMNS:
+                getattr(self, column).tofile(tree_file)
 
-        def get_size(self):
-            '''Calculates the size of the node and returns it.'''
-            header = 2
-            childrens_size = sum(children.get_size()
-                                 for children in self.childrens)
-            size = header + self.metadata_count + childrens_size
+    @classmethod
+    def load(cls, path):
+        '''Reads the tree written by save() from a binary file.'''
+        tree = cls([])
 
-            return size
+        with open(path, 'rb') as tree_file:
+            sizes = array('q')
+            sizes.fromfile(tree_file, 2)
+            numbers_count, node_count = sizes
+            tree.numbers.fromfile(tree_file, numbers_count)
+            for column in cls.COLUMNS:
+                getattr(tree, column).fromfile(tree_file, node_count)
 
-        def sum(self):
-            '''Sums all metadata entries and returns it.'''
-            return sum(self.metadata + [children.sum() for children in self.childrens])
+        return tree
 
-    # Creates a master node, which in turn creates all the other nodes
-    root_node = Node(numbers)
 
-    # Gets the sum of all metadata entries
-    sum_ = root_node.sum()
+def part_one(numbers):
+    '''
+    Question:
+        What is the sum of all metadata entries?
 
+    Walks the tree and sums all metadata entries.
+    '''
+    sum_, _ = parse_tree(numbers)
     return sum_
 
 
@@ -56,56 +206,10 @@ def part_two(numbers):
     Question:
         What is the value of the root node?
 
-    Creates a master node that recursively creates all other nodes. Calculates
-    a value according to the specified rules recursively.
+    Walks the tree and calculates a value of each node according to the
+    specified rules from values of its children.
     '''
-
-    class Node():
-        '''Class representing a node of the tree.'''
-
-        def __init__(self, sequence):
-
-            self.child_count = sequence[0]
-            self.metadata_count = sequence[1]
-            sequence = sequence[2:]
-            self.childrens = []
-
-            # Creates children's nodes and adds them to the list
-            for _ in range(self.child_count):
-                child_node = Node(sequence)
-                self.childrens.append(child_node)
-                sequence = sequence[child_node.get_size():]
-
-            self.metadata = sequence[:self.metadata_count]
-
-        def get_size(self):
-            '''Calculates the size of the node and returns it.'''
-            header = 2
-            childrens_size = sum(children.get_size()
-                                 for children in self.childrens)
-            size = header + self.metadata_count + childrens_size
-
-            return size
-
-        def value(self):
-            '''Calculates the value of a node and returns it.'''
-            if self.childrens:
-                value = 0
-                for i in self.metadata:
-                    index = i - 1
-                    if index < len(self.childrens):
-                        value += self.childrens[index].value()
-            else:
-                value = sum(self.metadata)
-
-            return value
-
-    # Creates a master node, which in turn creates all the other nodes
-    root_node = Node(numbers)
-
-    # Gets the value of the root node
-    value = root_node.value()
-
+    _, value = parse_tree(numbers)
     return value
 
 